@@ -5,21 +5,38 @@ Reads metadata.json files from S3 for each tool and produces a single
 packages.json consumed by the GitHub Pages frontend.
 
 Environment variables:
-    S3_BUCKET   - S3 bucket name (e.g. jelly-prd-cdn-static)
-    S3_PREFIX   - Key prefix (e.g. packages)
-    CDN_BASE    - Public CDN URL base (e.g. https://files.project-jelly.io/packages)
-    OUTPUT_FILE - Output path (e.g. docs/data/packages.json)
+    S3_BUCKET     - S3 bucket name (e.g. jelly-prd-cdn-static)
+    S3_PREFIX     - Key prefix (e.g. packages)
+    CDN_BASE      - Public CDN URL base (e.g. https://files.project-jelly.io/packages)
+    OUTPUT_FILE   - Output path (e.g. docs/data/packages.json)
+    CACHE_DIR     - ETag-keyed metadata.json cache (default .cache/metadata; empty disables)
+    FORCE_REFRESH - Set to 1 to ignore cached metadata and download every object
 """
 
 from __future__ import annotations
 
+import hashlib
 import json
 import os
-import subprocess
 import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
 
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson parses bytes directly and raises a json.JSONDecodeError subclass.
+json_loads = orjson.loads if orjson is not None else json.loads
+
 # ---------------------------------------------------------------------------
 # Tool registry
 #   type: "simple"       → {tool}/{BUILD_DATE}/metadata.json
@@ -58,59 +75,138 @@ TOOLS: dict[str, dict] = {
 S3_BUCKET = os.environ.get("S3_BUCKET", "jelly-prd-cdn-static")
 S3_PREFIX = os.environ.get("S3_PREFIX", "packages").strip("/")
 CDN_BASE = os.environ.get("CDN_BASE", "https://files.project-jelly.io/packages").rstrip("/")
-OUTPUT_FILE = os.environ.get("OUTPUT_FILE", "docs/data/packages.json")
+OUTPUT_FILE = Path(os.environ.get("OUTPUT_FILE", "docs/data/packages.json"))
+CACHE_DIR = os.environ.get("CACHE_DIR", ".cache/metadata")
+FORCE_REFRESH = os.environ.get("FORCE_REFRESH", "") == "1"
+
+# Concurrent metadata.json GETs across all tools (kept below the connection pool size).
+FETCH_WORKERS = 32
+
+
+# One long-lived client: connections are pooled and reused across every call.
+# Transient errors and throttling are retried by the SDK; anything that still
+# fails aborts the run rather than publishing a packages.json missing a tool.
+_S3 = boto3.client(
+    "s3",
+    config=Config(
+        max_pool_connections=64,
+        retries={"max_attempts": 10, "mode": "adaptive"},
+    ),
+)
+
+# Shared by every tool so parallel processors cannot oversubscribe the pool.
+_FETCH_POOL = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="s3-fetch")
+
 
+def s3_uri(key: str) -> str:
+    return f"s3://{S3_BUCKET}/{key}"
 
-def s3_base() -> str:
-    return f"s3://{S3_BUCKET}/{S3_PREFIX}"
+
+def s3_key(*parts: str) -> str:
+    """Join *parts* under ``S3_PREFIX`` into an object key."""
+    return "/".join((S3_PREFIX, *parts))
 
 
 # ---------------------------------------------------------------------------
 # S3 helpers
 # ---------------------------------------------------------------------------
-def s3_list_prefixes(path: str) -> list[str]:
-    """Return subdirectory names under *path* using ``aws s3 ls``.
+def s3_list_metadata_dirs(prefix: str) -> dict[tuple[str, ...], str]:
+    """Map the directory parts of every ``metadata.json`` below key *prefix* to its ETag.
 
-    Parses lines with the ``PRE`` marker emitted by ``aws s3 ls``.
+    Walks the whole subtree with a single paginated ``list_objects_v2`` call, so
+    ``{prefix}/a/b/metadata.json`` yields ``("a", "b")``.
     """
-    result = subprocess.run(
-        ["aws", "s3", "ls", f"{path}/"],
-        capture_output=True,
-        text=True,
-        check=False,
-    )
-    if result.returncode != 0:
-        print(f"  [warn] s3 ls failed for {path}: {result.stderr.strip()}", file=sys.stderr)
-        return []
-
-    prefixes: list[str] = []
-    for line in result.stdout.splitlines():
-        line = line.strip()
-        if line.startswith("PRE "):
-            name = line[4:].strip().rstrip("/")
-            if name:
-                prefixes.append(name)
-    return prefixes
-
-
-def s3_fetch_json(path: str) -> dict | None:
-    """Download a JSON file from S3 and return parsed content."""
-    result = subprocess.run(
-        ["aws", "s3", "cp", path, "-"],
-        capture_output=True,
-        text=True,
-        check=False,
-    )
-    if result.returncode != 0:
-        print(f"  [warn] s3 cp failed for {path}: {result.stderr.strip()}", file=sys.stderr)
+    paginator = _S3.get_paginator("list_objects_v2")
+    dirs: dict[tuple[str, ...], str] = {}
+    for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=f"{prefix}/"):
+        for obj in page.get("Contents", []):
+            rel = obj["Key"][len(prefix) + 1:]
+            if rel.endswith("/metadata.json"):
+                dirs[tuple(rel.split("/")[:-1])] = obj.get("ETag", "")
+    return dirs
+
+
+def cache_paths(key: str) -> tuple[Path, Path] | None:
+    """Return the ``(etag, body)`` cache files for *key*, or None if caching is off."""
+    if not CACHE_DIR:
         return None
+    digest = hashlib.sha256(s3_uri(key).encode()).hexdigest()
+    base = Path(CACHE_DIR) / digest
+    return base.with_suffix(".etag"), base.with_suffix(".json")
+
+
+def cache_read(key: str) -> tuple[str, bytes] | None:
+    """Return the cached ``(etag, body)`` for *key* if both files exist."""
+    paths = cache_paths(key)
+    if paths is None:
+        return None
+    etag_path, body_path = paths
     try:
-        return json.loads(result.stdout)
+        return etag_path.read_text(), body_path.read_bytes()
+    except OSError:
+        return None
+
+
+def cache_write(key: str, etag: str, body: bytes) -> None:
+    """Store *body* under *etag*; the body is written first so a partial write misses."""
+    paths = cache_paths(key)
+    if paths is None or not etag:
+        return
+    etag_path, body_path = paths
+    try:
+        body_path.parent.mkdir(parents=True, exist_ok=True)
+        body_path.write_bytes(body)
+        etag_path.write_text(etag)
+    except OSError as exc:
+        print(f"  [warn] cache write failed for {key}: {exc}", file=sys.stderr)
+
+
+def s3_get_bytes(key: str, cached: tuple[str, bytes] | None) -> bytes | None:
+    """GET *key*, revalidating *cached* with ``If-None-Match``; None if it is missing."""
+    kwargs = {"IfNoneMatch": cached[0]} if cached else {}
+    try:
+        resp = _S3.get_object(Bucket=S3_BUCKET, Key=key, **kwargs)
+    except ClientError as exc:
+        code = exc.response.get("Error", {}).get("Code")
+        if cached and code == "304":
+            return cached[1]
+        if code == "NoSuchKey":
+            print(f"  [warn] s3 object missing: {key}", file=sys.stderr)
+            return None
+        raise
+    body = resp["Body"].read()
+    cache_write(key, resp.get("ETag", ""), body)
+    return body
+
+
+@lru_cache(maxsize=512)
+def s3_fetch_json(key: str, etag: str = "") -> dict | None:
+    """Download a JSON object from S3 and return parsed content.
+
+    If *etag* (from the listing) matches the cached copy, no request is made at
+    all; otherwise the cached copy is revalidated with ``If-None-Match`` and a 304
+    skips the body transfer. Repeat calls for the same key within a run are served
+    from memory, so callers must not mutate the result.
+    """
+    cached = None if FORCE_REFRESH else cache_read(key)
+    if cached and etag and cached[0] == etag:
+        body = cached[1]
+    else:
+        body = s3_get_bytes(key, cached)
+        if body is None:
+            return None
+    try:
+        return json_loads(body)
     except json.JSONDecodeError as exc:
-        print(f"  [warn] invalid JSON from {path}: {exc}", file=sys.stderr)
+        print(f"  [warn] invalid JSON from {key}: {exc}", file=sys.stderr)
         return None
 
 
+def s3_fetch_json_many(keys: list[str], etags: list[str]) -> list[dict | None]:
+    """Fetch several JSON objects concurrently; results keep the order of *keys*."""
+    return list(_FETCH_POOL.map(s3_fetch_json, keys, etags))
+
+
 # ---------------------------------------------------------------------------
 # download_url builders
 # ---------------------------------------------------------------------------
@@ -127,36 +223,54 @@ def download_url_os_versioned(tool: str, os_ver: str, build: str) -> str:
 # ---------------------------------------------------------------------------
 # Per-type processors
 # ---------------------------------------------------------------------------
-def process_simple(tool_name: str, description: str) -> dict | None:
-    """Process a *simple* tool: fetch metadata.json for ALL builds (newest first)."""
-    base = f"{s3_base()}/{tool_name}"
-    print(f"[{tool_name}] Listing builds at {base}")
+OPTIONAL_META_KEYS = ("sha256", "file_size", "arch")
+
+
+def build_entry(ident: dict, download_url: str, meta: dict) -> dict:
+    """Assemble one ``builds`` entry: *ident*, download_url, packages, optional keys."""
+    entry = {
+        **ident,
+        "download_url": download_url,
+        "packages": meta.get("packages", []),
+    }
+    for key in OPTIONAL_META_KEYS:
+        if meta.get(key):
+            entry[key] = meta[key]
+    return entry
+
 
-    versions = s3_list_prefixes(base)
+def process_simple(
+    tool_name: str, description: str, meta_dirs: dict[tuple[str, ...], str]
+) -> dict | None:
+    """Process a *simple* tool: fetch metadata.json for ALL builds (newest first).
+
+    *meta_dirs* maps the directory parts below ``{tool}/`` of each metadata.json
+    to its listed ETag.
+    """
+    base = s3_key(tool_name)
+
+    versions = [parts[0] for parts in meta_dirs if len(parts) == 1]
     if not versions:
-        print(f"  [skip] no versions found for {tool_name}")
+        print(f"[{tool_name}] [skip] no versions found")
         return None
 
     versions = sorted(versions, reverse=True)
-    print(f"  Found {len(versions)} build(s): {', '.join(versions)}")
+    print(f"[{tool_name}] Found {len(versions)} build(s): {', '.join(versions)}")
+
+    metas = s3_fetch_json_many(
+        [f"{base}/{ver}/metadata.json" for ver in versions],
+        [meta_dirs[(ver,)] for ver in versions],
+    )
 
     builds: list[dict] = []
-    for ver in versions:
-        meta_path = f"{base}/{ver}/metadata.json"
-        meta = s3_fetch_json(meta_path)
+    for ver, meta in zip(versions, metas):
         if meta is None:
-            print(f"  [skip] no metadata for build {ver}")
+            print(f"[{tool_name}] [skip] no metadata for build {ver}")
             continue
 
-        entry = {
-            "version": ver,
-            "download_url": download_url_simple(tool_name, ver),
-            "packages": meta.get("packages", []),
-        }
-        for key in ("sha256", "file_size", "arch"):
-            if meta.get(key):
-                entry[key] = meta[key]
-        builds.append(entry)
+        builds.append(
+            build_entry({"version": ver}, download_url_simple(tool_name, ver), meta)
+        )
 
     if not builds:
         return None
@@ -168,46 +282,52 @@ def process_simple(tool_name: str, description: str) -> dict | None:
     }
 
 
-def process_os_versioned(tool_name: str, description: str) -> dict | None:
-    """Process an *os_versioned* tool: iterate OS versions, fetch ALL builds each."""
-    base = f"{s3_base()}/{tool_name}"
-    print(f"[{tool_name}] Listing OS versions at {base}")
+def process_os_versioned(
+    tool_name: str, description: str, meta_dirs: dict[tuple[str, ...], str]
+) -> dict | None:
+    """Process an *os_versioned* tool: iterate OS versions, fetch ALL builds each.
 
-    os_versions = s3_list_prefixes(base)
-    if not os_versions:
-        print(f"  [skip] no OS versions found for {tool_name}")
+    *meta_dirs* maps the directory parts below ``{tool}/`` of each metadata.json
+    to its listed ETag.
+    """
+    base = s3_key(tool_name)
+
+    os_builds: dict[str, list[str]] = {}
+    for parts in meta_dirs:
+        if len(parts) == 2:
+            os_builds.setdefault(parts[0], []).append(parts[1])
+    if not os_builds:
+        print(f"[{tool_name}] [skip] no OS versions found")
         return None
 
-    os_data: dict[str, dict] = {}
-    for os_ver in sorted(os_versions):
-        os_base = f"{base}/{os_ver}"
-        print(f"  [{os_ver}] Listing builds at {os_base}")
-
-        build_names = s3_list_prefixes(os_base)
-        if not build_names:
-            print(f"    [skip] no builds for {os_ver}")
-            continue
+    os_builds = {os_ver: sorted(os_builds[os_ver], reverse=True) for os_ver in sorted(os_builds)}
+    for os_ver, build_names in os_builds.items():
+        print(f"[{tool_name}] [{os_ver}] Found {len(build_names)} build(s): "
+              f"{', '.join(build_names)}")
 
-        build_names = sorted(build_names, reverse=True)
-        print(f"    Found {len(build_names)} build(s): {', '.join(build_names)}")
+    targets = [(os_ver, b) for os_ver, names in os_builds.items() for b in names]
+    metas = s3_fetch_json_many(
+        [f"{base}/{os_ver}/{b}/metadata.json" for os_ver, b in targets],
+        [meta_dirs[target] for target in targets],
+    )
+    meta_by_build = dict(zip(targets, metas))
 
+    os_data: dict[str, dict] = {}
+    for os_ver, build_names in os_builds.items():
         builds: list[dict] = []
         for build_name in build_names:
-            meta_path = f"{os_base}/{build_name}/metadata.json"
-            meta = s3_fetch_json(meta_path)
+            meta = meta_by_build[(os_ver, build_name)]
             if meta is None:
-                print(f"    [skip] no metadata for build {build_name}")
+                print(f"[{tool_name}] [{os_ver}] [skip] no metadata for build {build_name}")
                 continue
 
-            entry = {
-                "build": build_name,
-                "download_url": download_url_os_versioned(tool_name, os_ver, build_name),
-                "packages": meta.get("packages", []),
-            }
-            for key in ("sha256", "file_size", "arch"):
-                if meta.get(key):
-                    entry[key] = meta[key]
-            builds.append(entry)
+            builds.append(
+                build_entry(
+                    {"build": build_name},
+                    download_url_os_versioned(tool_name, os_ver, build_name),
+                    meta,
+                )
+            )
 
         if builds:
             os_data[os_ver] = {"builds": builds}
@@ -231,16 +351,72 @@ PROCESSORS = {
 }
 
 
+def is_unchanged(out_path: Path, output: dict) -> bool:
+    """True if *out_path* already holds *output*, ignoring ``generated_at``.
+
+    Skipping the write keeps the file (and its mtime) untouched, so the workflow's
+    ``git diff`` sees no change and does not commit a timestamp-only update.
+    """
+    try:
+        existing = json.loads(out_path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return False
+    existing.pop("generated_at", None)
+    return existing == {k: v for k, v in output.items() if k != "generated_at"}
+
+
+def write_json_atomic(out_path: Path, output: dict) -> None:
+    """Write *output* to a sibling temp file, then ``os.replace`` it into place.
+
+    Readers (the Pages dev server, the workflow's git diff) never see a partial file.
+    """
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(
+        dir=out_path.parent, prefix=f".{out_path.name}.", suffix=".tmp"
+    )
+    try:
+        if orjson is not None:
+            # Byte-identical to the json.dump branch below, but serialized in C.
+            with os.fdopen(fd, "wb") as f:
+                f.write(
+                    orjson.dumps(output, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE)
+                )
+        else:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(output, f, indent=2, ensure_ascii=False)
+                f.write("\n")
+        os.chmod(tmp_name, 0o644)
+        os.replace(tmp_name, out_path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
 def main() -> None:
     tools_output: dict[str, dict] = {}
     failures: list[str] = []
 
-    for tool_name, cfg in TOOLS.items():
-        tool_type = cfg["type"]
-        description = cfg["description"]
-        processor = PROCESSORS[tool_type]
+    # One recursive walk over the whole prefix replaces per-tool/per-OS listings.
+    root = s3_key()
+    print(f"Listing metadata at {s3_uri(root)}")
+    meta_dirs: dict[str, dict[tuple[str, ...], str]] = {}
+    for (tool_name, *parts), etag in s3_list_metadata_dirs(root).items():
+        meta_dirs.setdefault(tool_name, {})[tuple(parts)] = etag
+
+    # Tools are independent; run them side by side and collect in registry order.
+    with ThreadPoolExecutor(max_workers=len(TOOLS)) as executor:
+        futures = {
+            tool_name: executor.submit(
+                PROCESSORS[cfg["type"]],
+                tool_name,
+                cfg["description"],
+                meta_dirs.get(tool_name, {}),
+            )
+            for tool_name, cfg in TOOLS.items()
+        }
 
-        result = processor(tool_name, description)
+    for tool_name, future in futures.items():
+        result = future.result()
         if result is None:
             failures.append(tool_name)
         else:
@@ -259,11 +435,13 @@ def main() -> None:
         "tools": tools_output,
     }
 
-    out_path = Path(OUTPUT_FILE)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    out_path.write_text(json.dumps(output, indent=2, ensure_ascii=False) + "\n")
+    if is_unchanged(OUTPUT_FILE, output):
+        print(f"\nNo changes: {OUTPUT_FILE} already matches ({len(tools_output)} tool(s))")
+        return
+
+    write_json_atomic(OUTPUT_FILE, output)
 
-    print(f"\nWrote {out_path} with {len(tools_output)} tool(s)")
+    print(f"\nWrote {OUTPUT_FILE} with {len(tools_output)} tool(s)")
 
 
 if __name__ == "__main__":